@@ -1,4 +1,5 @@
 import argparse
+import selectors
 import subprocess
 import sys
 import os
@@ -7,6 +8,67 @@ import time
 from datetime import datetime
 
 
+def _run_fast(command):
+    """Run a command and capture its output with an event-driven wait.
+
+    subprocess.run's communicate() path can fall back to internal polling;
+    here we register the child's pidfd together with its stdout/stderr pipes
+    on a selector and block until data arrives or the child exits — one
+    wakeup per event instead of a poll loop. Falls back to communicate()
+    where pidfd_open is unavailable (non-Linux or kernel < 5.3).
+    """
+    # close_fds=False (with no preexec_fn/shell/cwd) keeps CPython on the
+    # posix_spawn fast path instead of fork+exec.
+    proc = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=False
+    )
+    pidfd = None
+    if hasattr(os, "pidfd_open"):
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+        except OSError:
+            pidfd = None
+    if pidfd is None:
+        stdout, stderr = proc.communicate()
+        return subprocess.CompletedProcess(
+            command, proc.returncode, stdout.decode(), stderr.decode()
+        )
+
+    stdout_fd = proc.stdout.fileno()
+    stderr_fd = proc.stderr.fileno()
+    buffers = {stdout_fd: [], stderr_fd: []}
+    selector = selectors.DefaultSelector()
+    selector.register(stdout_fd, selectors.EVENT_READ)
+    selector.register(stderr_fd, selectors.EVENT_READ)
+    selector.register(pidfd, selectors.EVENT_READ)
+    open_pipes = 2
+    try:
+        while open_pipes:
+            for key, _ in selector.select():
+                if key.fd == pidfd:
+                    # Child exited; keep draining until the pipes hit EOF.
+                    selector.unregister(pidfd)
+                    continue
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    buffers[key.fd].append(chunk)
+                else:
+                    selector.unregister(key.fd)
+                    open_pipes -= 1
+    finally:
+        selector.close()
+        os.close(pidfd)
+        returncode = proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+    return subprocess.CompletedProcess(
+        command,
+        returncode,
+        b"".join(buffers[stdout_fd]).decode(),
+        b"".join(buffers[stderr_fd]).decode(),
+    )
+
+
 def get_bendsql_warehouse_from_env():
     """Retrieve warehouse name from the environment variable."""
     dsn = os.environ.get("BENDSQL_DSN", "")
@@ -38,11 +100,10 @@ def execute_snowsql(query, database, warehouse):
         query,
     ]
 
-    try:
-        result = subprocess.run(command, text=True, capture_output=True, check=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"snowsql command failed: {e.stderr}")
+    result = _run_fast(command)
+    if result.returncode != 0:
+        raise RuntimeError(f"snowsql command failed: {result.stderr}")
+    return result.stdout
 
 
 def extract_snowsql_time(output):
@@ -54,7 +115,7 @@ def extract_snowsql_time(output):
 def execute_bendsql(query, database):
     """Execute an SQL query using bendsql."""
     command = ["bendsql", "--query=" + query, "--database=" + database, "--time=server"]
-    result = subprocess.run(command, text=True, capture_output=True)
+    result = _run_fast(command)
 
     if "APIError: ResponseError" in result.stderr:
         raise RuntimeError(
@@ -1,10 +1,128 @@
 import argparse
+import asyncio
+import collections
+import decimal
+import difflib
+import hashlib
+import os
 import re
 import sys
-import subprocess
 import time
+import uuid
+from functools import lru_cache
 from termcolor import colored
 
+try:
+    import sqlparse
+except ImportError:  # optional; the naive splitter still works for simple scripts
+    sqlparse = None
+
+# Optional native drivers (see --native); the CLI path remains the default.
+try:
+    from databend_driver import AsyncDatabendClient
+except ImportError:
+    AsyncDatabendClient = None
+try:
+    import snowflake.connector as snowflake_connector
+except ImportError:
+    snowflake_connector = None
+
+# Matches the query identifier comment (like "-- MERGE-INTO-C13:") at the
+# head of each statement; compiled once instead of per query in the hot loop.
+_ID_RE = re.compile(r"--\s*([\w-]+):")
+
+_ANSI_COLORS = {"red": "\033[31m", "green": "\033[32m", "yellow": "\033[33m"}
+_ANSI_RESET = "\033[0m"
+
+# How many lines of a result to keep/show when only a preview is needed.
+_PREVIEW_LINES = 20
+
+# Set from --verbose in main(); gates per-query command echoes.
+_VERBOSE = False
+
+
+_LINE_COMMENT_RE = re.compile(r"--[^\n]*")
+
+# What counts as a real error on a session's stderr (vs. version or
+# deprecation warnings, which snowsql emits on perfectly healthy runs).
+_STDERR_ERROR_RE = re.compile(r"error|exception|failed|cannot|unable", re.IGNORECASE)
+
+
+def normalize_query(query):
+    """Canonical form of a query for within-run memoization: comments and
+    reflowed whitespace don't make two queries different."""
+    if sqlparse is not None:
+        return " ".join(sqlparse.format(query, strip_comments=True).split())
+    # Every check.sql statement carries a unique "-- ID:" comment, so the
+    # fallback must strip line comments too or nothing would ever dedup.
+    return " ".join(_LINE_COMMENT_RE.sub("", query).split())
+
+
+def split_sql_statements(sql_script):
+    """Split a script into individual statements.
+
+    sqlparse understands semicolons inside string literals, comments and
+    $$ ... $$ procedure bodies, which the naive split(";") breaks on; fall
+    back to the naive split when sqlparse isn't installed."""
+    if sqlparse is not None:
+        return [
+            stmt
+            for stmt in (s.strip().rstrip(";") for s in sqlparse.split(sql_script))
+            if stmt
+        ]
+    return [q for q in (s.strip() for s in sql_script.split(";")) if q]
+
+
+@lru_cache(maxsize=None)
+def tool_argv(sql_tool, database, warehouse=None):
+    """Shared CLI argv for a tool/database pair, built once per run.
+
+    snowsql takes ~14 argv entries of fixed flags; rebuilding that list for
+    every call adds up in the hot loop, so callers copy this template and
+    append only their call-specific arguments."""
+    if sql_tool == "snowsql":
+        argv = [
+            "snowsql",
+            "--dbname", database,
+            "--schemaname", "PUBLIC",
+            "-o", "output_format=tsv",
+            "-o", "header=false",
+            "-o", "timing=false",
+            "-o", "friendly=false",
+        ]
+        if warehouse:
+            argv.extend(["--warehouse", warehouse])
+    else:
+        argv = ["bendsql", "-D", database]
+    return tuple(argv)
+
+
+def normalize_result(text):
+    """Normalize a query result for comparison: drop blank lines, strip
+    trailing whitespace, and sort rows so non-deterministic row order from
+    parallel scans doesn't register as a difference."""
+    return sorted(line.rstrip() for line in text.splitlines() if line.strip())
+
+
+def print_result_block(text, color=None, max_lines=_PREVIEW_LINES, indent=""):
+    """Stream a (possibly huge) query result to stdout.
+
+    Wraps the whole block in a single ANSI color sequence and truncates it to
+    max_lines instead of building a colored copy of the full string in memory
+    (colored() on a multi-MB result doubles its footprint and the terminal
+    I/O dominates runtime).
+    """
+    lines = text.splitlines() if isinstance(text, str) else list(text)
+    if color:
+        sys.stdout.write(_ANSI_COLORS[color])
+    for line in lines[:max_lines]:
+        sys.stdout.write(f"{indent}{line}\n")
+    if len(lines) > max_lines:
+        sys.stdout.write(f"{indent}... ({len(lines) - max_lines} more lines)\n")
+    if color:
+        sys.stdout.write(_ANSI_RESET)
+    sys.stdout.flush()
+
 
 def parse_arguments():
     parser = argparse.ArgumentParser(
@@ -32,123 +150,728 @@ def parse_arguments():
     parser.add_argument(
         "--runsnow", action="store_true", help="Run only snowsql setup and action"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of check queries to run in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Enable the on-disk check query result cache and store it in "
+        "this directory (off by default: stale results would mask engine "
+        "divergence, the very thing this tool exists to catch)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore --cache-dir and always re-execute check queries",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Echo every command before executing it",
+    )
+    parser.add_argument(
+        "--native",
+        action="store_true",
+        help="Use native Python drivers (databend-driver, "
+        "snowflake-connector-python) for check queries when installed",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Stop at the first check failure and cancel in-flight queries",
+    )
     args = parser.parse_args()
     return args
 
 
-def execute_sql(query, sql_tool, database, warehouse=None):
-    command = [sql_tool]
+async def execute_sql(query, sql_tool, database, warehouse=None):
+    command = list(tool_argv(sql_tool, database, warehouse))
     if sql_tool == "snowsql":
-        command.extend([
-            "--query", query,
-            "--dbname", database,
-            "--schemaname", "PUBLIC",
-            "-o", "output_format=tsv",
-            "-o", "header=false",
-            "-o", "timing=false",
-            "-o", "friendly=false",
-        ])
-        if warehouse:
-            command.extend(["--warehouse", warehouse])
-    elif sql_tool == "bendsql":
-        command.extend(["--query=" + query, "-D", database])
-
-    print(f"Executing command: {' '.join(command)}")
+        command.extend(["--query", query])
+    else:
+        command.append("--query=" + query)
 
-    try:
-        result = subprocess.run(command, text=True, capture_output=True, check=False)
-        output = result.stdout
-        error = result.stderr
+    # Joining the full argv copies the query (possibly many KB) into the
+    # formatted line for every call; only spend that (truncated) under
+    # --verbose.
+    if _VERBOSE:
+        print(f"exec: {command[0]} … {query[:80]}")
 
-        # For database setup operations, we want to continue even if there are errors
-        if "DROP DATABASE" in query and "Unknown database" in (output + error):
-            print("Database doesn't exist, continuing with creation...")
-            return output
+    # close_fds=False (with no preexec_fn/shell/cwd) lets CPython spawn via
+    # posix_spawn instead of fork+exec, skipping the page-table copy of this
+    # (potentially large) parent for every short-lived CLI call.
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        close_fds=False,
+    )
 
-        # Custom check for known error patterns
-        if ("error" in output.lower() or "error" in error.lower() or 
-            "unknown function" in output.lower()):
-            error_message = f"Error detected in command output: {output or error}"
-            print(colored(error_message, "red"))  # Print the error in red
-            if "DROP DATABASE" in query:
-                # Don't exit for database drop errors
-                return output
-            sys.exit(1)
+    # Stream stdout line by line instead of buffering the whole result:
+    # callers only ever need a bounded preview, so peak memory stays at
+    # O(preview) rather than O(result) and the buffer is walked once.
+    stderr_task = asyncio.create_task(process.stderr.read())
+    preview = collections.deque(maxlen=_PREVIEW_LINES)
+    line_count = 0
+    while True:
+        raw = await process.stdout.readline()
+        if not raw:
+            break
+        preview.append(raw.decode().rstrip("\n"))
+        line_count += 1
+    error = (await stderr_task).decode()
+    await process.wait()
+    output = "\n".join(preview)
 
-        print("Command executed successfully. Output:")
-        print(output)
+    # For database setup operations, we want to continue even if there are errors
+    if "DROP DATABASE" in query and "Unknown database" in error:
+        print("Database doesn't exist, continuing with creation...")
         return output
-    except subprocess.CalledProcessError as e:
-        error_message = f"{sql_tool} command failed: {e.stderr}"
+
+    # Trust the tool's exit code instead of scanning (and lowercasing) the
+    # whole output for error substrings, which materializes a copy of
+    # potentially multi-MB results and misfires on rows that legitimately
+    # contain the word "error".
+    if process.returncode != 0:
+        error_message = (
+            f"{sql_tool} exited with {process.returncode}: {error or output}"
+        )
         print(colored(error_message, "red"))  # Print the error in red
-        # Re-raise the exception to be handled by the caller
-        raise
+        if "DROP DATABASE" in query:
+            # Don't exit for database drop errors
+            return output
+        sys.exit(1)
+
+    print("Command executed successfully. Output:")
+    print_result_block(preview)
+    if line_count > len(preview):
+        print(f"... ({line_count - len(preview)} earlier lines not shown)")
+    return output
+
+
+class SqlSession:
+    """A long-lived bendsql/snowsql subprocess that executes queries over stdin.
+
+    Spawning a fresh CLI process per query pays fork + TCP + auth latency every
+    time, which dominates runtime for short queries. Instead we keep one
+    interactive process alive per tool, write each query followed by a sentinel
+    SELECT, and read stdout until the sentinel appears; everything before it is
+    the query result.
+
+    This framing assumes both CLIs execute piped statements incrementally; a
+    tool that buffers stdin to EOF before executing would deadlock on the
+    first sentinel read. Note also that stderr is drained by a separate task,
+    so an error written just before a sentinel can surface one query late —
+    it is still reported, the batch still aborts, only the attribution can
+    shift by one.
+    """
+
+    def __init__(self, sql_tool, database, warehouse=None):
+        self.sql_tool = sql_tool
+        self._lock = asyncio.Lock()
+        self._process = None
+        self._stderr_task = None
+        self._stderr_lines = []
+
+        command = list(tool_argv(sql_tool, database, warehouse))
+        if sql_tool == "snowsql":
+            command.extend(["-o", "exit_on_error=false"])
+        self._command = command
+
+    async def start(self):
+        # stderr is the tools' error channel; keep it separate from results
+        # and drain it on a background task so the pipe never fills up.
+        self._process = await asyncio.create_subprocess_exec(
+            *self._command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            close_fds=False,
+        )
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        return self
+
+    async def _drain_stderr(self):
+        while True:
+            line = await self._process.stderr.readline()
+            if not line:
+                break
+            self._stderr_lines.append(line.decode())
+
+    def _check_stderr(self, mark):
+        """Raise if stderr since the given high-water mark looks like an error.
+
+        snowsql routinely writes version/deprecation warnings to stderr on
+        healthy runs, so only recognizable error text aborts the session."""
+        error = "".join(self._stderr_lines[mark:])
+        if _STDERR_ERROR_RE.search(error):
+            raise RuntimeError(f"{self.sql_tool} error: {error.strip()}")
+
+    async def _drain_stdin(self, mark):
+        """Flush queued stdin writes; a CLI that died mid-write raises the
+        session's usual RuntimeError instead of a bare pipe error."""
+        try:
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            self._check_stderr(mark)
+            raise RuntimeError(
+                f"{self.sql_tool} session terminated while submitting queries"
+            )
+
+    async def run(self, query):
+        sentinel = f"SENTINEL_{uuid.uuid4().hex}"
+        async with self._lock:
+            mark = len(self._stderr_lines)
+            self._process.stdin.write(f"{query.strip()};\nSELECT '{sentinel}';\n".encode())
+            await self._drain_stdin(mark)
+            lines = []
+            while True:
+                raw = await self._process.stdout.readline()
+                if not raw:
+                    self._check_stderr(mark)
+                    raise RuntimeError(
+                        f"{self.sql_tool} session terminated unexpectedly"
+                    )
+                line = raw.decode()
+                if sentinel in line:
+                    # Skip the echo of the sentinel SELECT itself; the real
+                    # marker row is the last occurrence before results resume.
+                    if "SELECT" in line:
+                        continue
+                    break
+                lines.append(line)
+            self._check_stderr(mark)
+        return "".join(lines)
+
+    async def run_script(self, queries):
+        """Pipeline a list of queries, yielding (output, elapsed) per query.
+
+        All queries are written to stdin up front, each followed by a unique
+        marker SELECT, then results are drained in order by splitting the
+        output stream on the markers. Submitting everything before reading
+        anything cuts total wall time from N*RTT to roughly RTT + N*server
+        time for independent read-only queries; yielding each result as its
+        marker is consumed lets the caller compare (and cancel) without
+        waiting for the rest of the batch.
+        """
+        token = uuid.uuid4().hex
+        async with self._lock:
+            mark = len(self._stderr_lines)
+            for i, query in enumerate(queries):
+                self._process.stdin.write(
+                    f"{query.strip()};\nSELECT 'MARKER_{i}_{token}';\n".encode()
+                )
+            await self._drain_stdin(mark)
+
+            for i in range(len(queries)):
+                marker = f"MARKER_{i}_{token}"
+                start_time = time.time()
+                lines = []
+                while True:
+                    raw = await self._process.stdout.readline()
+                    if not raw:
+                        self._check_stderr(mark)
+                        raise RuntimeError(
+                            f"{self.sql_tool} session terminated unexpectedly"
+                        )
+                    line = raw.decode()
+                    if marker in line:
+                        # Skip the echo of the marker SELECT itself
+                        if "SELECT" in line:
+                            continue
+                        break
+                    lines.append(line)
+                self._check_stderr(mark)
+                mark = len(self._stderr_lines)
+                yield "".join(lines), time.time() - start_time
+
+    async def close(self):
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._stderr_task is not None:
+            self._stderr_task.cancel()
+
+
+def _render_value(value):
+    """Render one driver result value the way the CLIs print it.
+
+    The drivers hand back typed Python values whose str() can diverge
+    between tools (Decimal('1.50') -> "1.50" vs float 1.5 -> "1.5"), which
+    would show up as spurious diffs. Numbers go through a canonical
+    float format so both sides render identically."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (float, decimal.Decimal)):
+        return format(float(value), ".12g")
+    return str(value)
 
 
-def execute_sql_scripts(sql_tool, script_path, database, warehouse=None):
+class BendDriverSession:
+    """SqlSession-compatible wrapper around databend-driver.
+
+    Connects once over BENDSQL_DSN (like double_check) instead of spawning
+    the CLI, skipping subprocess and re-auth overhead per pipeline. Results
+    are rendered as TSV text so the comparison path is unchanged."""
+
+    def __init__(self, database):
+        self._database = database
+        self._conn = None
+
+    async def start(self):
+        # Driver exceptions are library-specific; translate them to the
+        # RuntimeError the CLI sessions raise so the pipeline and
+        # fingerprint error handling treat both session kinds the same.
+        try:
+            client = AsyncDatabendClient(os.environ["BENDSQL_DSN"])
+            self._conn = await client.get_conn()
+            await self._conn.exec(f"USE {self._database}")
+        except Exception as e:
+            raise RuntimeError(f"databend-driver error: {e}") from e
+        return self
+
+    async def run(self, query):
+        try:
+            rows = await self._conn.query_iter(query)
+            lines = []
+            async for row in rows:
+                lines.append(
+                    "\t".join(_render_value(v) for v in row.values())
+                )
+        except Exception as e:
+            raise RuntimeError(f"databend-driver error: {e}") from e
+        return "\n".join(lines)
+
+    async def run_script(self, queries):
+        for query in queries:
+            start_time = time.time()
+            output = await self.run(query)
+            yield output, time.time() - start_time
+
+    async def close(self):
+        self._conn = None
+
+
+class SnowDriverSession:
+    """SqlSession-compatible wrapper around snowflake-connector-python.
+
+    The connector is synchronous, so queries run via asyncio.to_thread;
+    credentials come from the same SNOWSQL_* environment variables the CLI
+    uses. Results are rendered as TSV text for the comparison path."""
+
+    def __init__(self, database, warehouse=None):
+        self._database = database
+        self._warehouse = warehouse
+        self._conn = None
+
+    async def start(self):
+        # Same translation as BendDriverSession: connector errors become the
+        # RuntimeError the rest of the error handling expects.
+        try:
+            self._conn = await asyncio.to_thread(
+                snowflake_connector.connect,
+                account=os.environ["SNOWSQL_ACCOUNT"],
+                user=os.environ["SNOWSQL_USER"],
+                password=os.environ["SNOWSQL_PWD"],
+                database=self._database,
+                schema="PUBLIC",
+                warehouse=self._warehouse,
+            )
+        except Exception as e:
+            raise RuntimeError(f"snowflake-connector error: {e}") from e
+        return self
+
+    async def run(self, query):
+        def _query():
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute(query)
+                return "\n".join(
+                    "\t".join(_render_value(v) for v in row)
+                    for row in cursor.fetchall()
+                )
+            finally:
+                cursor.close()
+
+        try:
+            return await asyncio.to_thread(_query)
+        except Exception as e:
+            raise RuntimeError(f"snowflake-connector error: {e}") from e
+
+    async def run_script(self, queries):
+        for query in queries:
+            start_time = time.time()
+            output = await self.run(query)
+            yield output, time.time() - start_time
+
+    async def close(self):
+        if self._conn is not None:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+
+def _missing_env(names):
+    """Return the names in the given list that are unset or empty."""
+    return [name for name in names if not os.environ.get(name)]
+
+
+def make_session(sql_tool, database, warehouse=None, native=False):
+    """Pick a native driver session when requested and installed, otherwise
+    fall back to the persistent CLI session. A driver without its required
+    credentials in the environment also falls back, with a warning, instead
+    of dying on a KeyError mid-run."""
+    if native and sql_tool == "bendsql" and AsyncDatabendClient is not None:
+        missing = _missing_env(["BENDSQL_DSN"])
+        if not missing:
+            return BendDriverSession(database)
+        print(
+            colored(
+                f"WARN: --native needs {', '.join(missing)}; using the bendsql CLI instead",
+                "yellow",
+            )
+        )
+    if native and sql_tool == "snowsql" and snowflake_connector is not None:
+        missing = _missing_env(["SNOWSQL_ACCOUNT", "SNOWSQL_USER", "SNOWSQL_PWD"])
+        if not missing:
+            return SnowDriverSession(database, warehouse)
+        print(
+            colored(
+                f"WARN: --native needs {', '.join(missing)}; using the snowsql CLI instead",
+                "yellow",
+            )
+        )
+    return SqlSession(sql_tool, database, warehouse)
+
+
+async def execute_sql_scripts(sql_tool, script_path, database, warehouse=None):
+    """Execute a whole script in a single CLI invocation.
+
+    Running one subprocess per statement pays fork + auth for every line of
+    setup.sql; both tools accept a script file (snowsql -f) or stdin
+    (bendsql), so pipe the file through in one shot. If the batch run fails
+    we fall back to statement-by-statement execution to pinpoint and report
+    the offending query.
+    """
     print(f"Executing SQL scripts from: {script_path} using {sql_tool}")
+
+    command = list(tool_argv(sql_tool, database, warehouse))
+    if sql_tool == "snowsql":
+        command.extend(["--filename", script_path, "-o", "exit_on_error=true"])
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            close_fds=False,
+        )
+        stdout, _ = await process.communicate()
+    else:
+        with open(script_path, "r") as script:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=script,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                close_fds=False,
+            )
+            stdout, _ = await process.communicate()
+
+    if process.returncode == 0:
+        print("Script executed successfully. Output:")
+        print_result_block(stdout.decode())
+        return
+
+    print(colored(
+        f"{sql_tool} batch execution failed (exit {process.returncode}); "
+        "re-running statement by statement to locate the failure",
+        "yellow",
+    ))
+    # The batch already applied some statements before failing, and these
+    # scripts are full of non-idempotent DML, so the replay would double
+    # whatever data landed. It exists only to name the failing statement
+    # (execute_sql exits non-zero there); if everything replays cleanly the
+    # failure was transient, but the data is dirty either way, so stop.
     with open(script_path, "r") as file:
-        sql_script = file.read()
-    queries = sql_script.split(";")
+        queries = split_sql_statements(file.read())
     for query in queries:
-        if query.strip():
-            execute_sql(query, sql_tool, database, warehouse)
+        await execute_sql(query, sql_tool, database, warehouse)
+    print(colored(
+        f"{sql_tool} batch failure did not reproduce statement by statement; "
+        "data may have been applied twice — recreate the database and retry",
+        "red",
+    ))
+    sys.exit(1)
+
+
+def cache_key(sql_tool, database, fingerprint, query):
+    """Cache key for a check query result: tool + database + schema state + query."""
+    raw = f"{sql_tool}|{database}|{fingerprint}|{query.strip()}"
+    return hashlib.blake2b(raw.encode()).hexdigest()
+
+
+# Per-table name + row count + last-modified time: changes from action.sql
+# edits, data reloads or DDL all shift this, invalidating cached results.
+_FINGERPRINT_QUERIES = {
+    "bendsql": (
+        "SELECT name, num_rows, updated_on FROM system.tables "
+        "WHERE database = '{database}' ORDER BY name"
+    ),
+    "snowsql": (
+        "SELECT table_name, row_count, last_altered "
+        "FROM information_schema.tables ORDER BY table_name"
+    ),
+}
 
 
-def fetch_query_results(query, sql_tool, database, warehouse=None):
-    result = execute_sql(query, sql_tool, database, warehouse)
-    return result
+async def schema_fingerprint(sql_tool, database, warehouse=None, native=False):
+    """Hash of the database's table state, used to invalidate cached results.
 
+    Keyed on per-table row counts and update timestamps, not just the table
+    list — a fingerprint that misses data changes would let the cache serve
+    stale matches. Falls back to SHOW TABLES if the catalog query fails."""
+    session = make_session(sql_tool, database, warehouse, native)
+    await session.start()
+    try:
+        try:
+            tables = await session.run(
+                _FINGERPRINT_QUERIES[sql_tool].format(database=database)
+            )
+        except RuntimeError:
+            tables = await session.run("SHOW TABLES")
+    finally:
+        await session.close()
+    return hashlib.blake2b(tables.encode()).hexdigest()
 
-def run_check_sql(database_name, warehouse, script_path):
+
+async def run_check_sql(
+    database_name,
+    warehouse,
+    script_path,
+    jobs=1,
+    cache_dir=None,
+    fail_fast=False,
+    native=False,
+):
     failed_tests = []
     passed_tests = []
     total_start_time = time.time()
-    total_queries = 0
-    current_query = 0
 
     with open(script_path, "r") as file:
-        check_queries = file.read().split(";")
-        # Count non-empty queries
-        total_queries = sum(1 for q in check_queries if q.strip())
+        check_queries = split_sql_statements(file.read())
+    total_queries = len(check_queries)
 
     print(colored(f"\n{'='*80}", "blue"))
     print(colored(f"Starting comparison of {total_queries} queries between bendsql and snowsql", "blue"))
     print(colored(f"{'='*80}\n", "blue"))
 
-    for query in check_queries:
-        if query.strip():
-            current_query += 1
-            # Extract the query identifier (like MERGE-INTO-C13) from the comment
-            match = re.search(r"--\s*([\w-]+):", query)
-            query_identifier = match.group(1).strip() if match else f"Query-{current_query}"
+    # Extract the query identifier (like MERGE-INTO-C13) from the comment
+    queries_with_ids = []
+    for current_query, query in enumerate(check_queries, start=1):
+        match = _ID_RE.search(query)
+        query_identifier = match.group(1).strip() if match else f"Query-{current_query}"
+        queries_with_ids.append((query_identifier, query))
+
+    # Look up the on-disk cache first: repeated --run-check-only invocations
+    # against unchanged data can skip re-executing unchanged queries entirely.
+    # Keys include a schema fingerprint so any DDL/data reload invalidates
+    # stale entries.
+    use_cache = cache_dir is not None
+    fingerprints = {}
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        for sql_tool in ("bendsql", "snowsql"):
+            fingerprints[sql_tool] = await schema_fingerprint(
+                sql_tool, database_name, warehouse, native
+            )
 
-            # Print the preparing message with progress indicator
-            print(colored(f"\n[{current_query}/{total_queries}] Testing {query_identifier}...", "yellow"))
-            print(colored(f"Query: {query.strip()[:100]}{'...' if len(query.strip()) > 100 else ''}", "yellow"))
+    results = {"bendsql": {}, "snowsql": {}}
+    misses = {"bendsql": [], "snowsql": []}
+    seen = {"bendsql": {}, "snowsql": {}}
+    dup_map = {
+        "bendsql": collections.defaultdict(list),
+        "snowsql": collections.defaultdict(list),
+    }
+    for idx, (query_identifier, query) in enumerate(queries_with_ids):
+        norm = normalize_query(query)
+        for sql_tool in ("bendsql", "snowsql"):
+            # check.sql often repeats a query across test blocks (sometimes
+            # differing only in comments/whitespace); execute it once and let
+            # duplicates reuse the first occurrence's result. Safe because
+            # check queries are read-only against a frozen dataset.
+            first = seen[sql_tool].get(norm)
+            if first is not None:
+                if first in results[sql_tool]:
+                    results[sql_tool][idx] = results[sql_tool][first]
+                else:
+                    dup_map[sql_tool][first].append(idx)
+                continue
+            seen[sql_tool][norm] = idx
+            if use_cache:
+                key = cache_key(
+                    sql_tool, database_name, fingerprints[sql_tool], query
+                )
+                cache_path = os.path.join(cache_dir, f"{key}.txt")
+                if os.path.exists(cache_path):
+                    with open(cache_path, "r") as cache_file:
+                        results[sql_tool][idx] = (cache_file.read(), 0.0)
+                    continue
+            misses[sql_tool].append((idx, query))
 
-            start_time = time.time()
-            bend_result = fetch_query_results(query, "bendsql", database_name)
-            snow_result = fetch_query_results(
-                query, "snowsql", database_name, warehouse
+    # Pipeline the uncached queries through persistent sessions, one per tool:
+    # every query is submitted before the first result is drained, so total
+    # wall time is bounded by the slower tool rather than the sum of RTTs.
+    # --jobs N splits the script into N batches, each with its own session,
+    # for a second level of parallelism.
+    jobs = max(jobs, 1)
+    batch_size = -(-total_queries // jobs) if total_queries else 1
+
+    # Pipelines push each result onto a shared queue as its marker is
+    # consumed, so comparison never has to wait for a whole batch — that is
+    # what lets --fail-fast cancel work that is genuinely still in flight.
+    result_queue = asyncio.Queue()
+
+    async def run_pipeline(sql_tool, batch):
+        session = None
+        try:
+            session = make_session(sql_tool, database_name, warehouse, native)
+            await session.start()
+            position = 0
+            async for output, elapsed in session.run_script(
+                [query for _, query in batch]
+            ):
+                idx, query = batch[position]
+                position += 1
+                await result_queue.put((sql_tool, idx, query, output, elapsed))
+        except Exception as e:
+            # Surface any failure — including start() dying because the CLI
+            # binary is missing — through the queue, so the consumer below
+            # can't block forever on a result that will never arrive.
+            await result_queue.put(e)
+        finally:
+            if session is not None:
+                await session.close()
+
+    # One task per (tool, batch) pipeline; asyncio overlaps the two tools'
+    # (and batches') I/O on a single thread.
+    tasks = []
+    expected_results = 0
+    for sql_tool in ("bendsql", "snowsql"):
+        tool_misses = misses[sql_tool]
+        expected_results += len(tool_misses)
+        for i in range(0, len(tool_misses), batch_size):
+            batch = tool_misses[i : i + batch_size]
+            tasks.append(asyncio.create_task(run_pipeline(sql_tool, batch)))
+
+    def compare_query(idx):
+        """Compare both tools' results for one query; returns True on match."""
+        query_identifier, query = queries_with_ids[idx]
+        current_query = idx + 1
+        bend_result, bend_time = results["bendsql"][idx]
+        snow_result, snow_time = results["snowsql"][idx]
+        # Once compared, the full text is never read again (failures keep
+        # their diff in failed_tests), so drop it: memory stays bounded by
+        # the mismatches, not by every result of the run. Safe for
+        # duplicates — each index gets its own entry when results arrive.
+        del results["bendsql"][idx], results["snowsql"][idx]
+
+        # Print the progress indicator
+        print(colored(f"\n[{current_query}/{total_queries}] Testing {query_identifier}...", "yellow"))
+        print(colored(f"Query: {query[:100]}{'...' if len(query) > 100 else ''}", "yellow"))
+
+        elapsed_time = max(bend_time, snow_time)
+
+        bend_lines = normalize_result(bend_result)
+        snow_lines = normalize_result(snow_result)
+        if bend_lines != snow_lines:
+            diff = list(
+                difflib.unified_diff(
+                    bend_lines, snow_lines, "bendsql", "snowsql", lineterm=""
+                )
             )
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-
-            if bend_result != snow_result:
-                print(colored("❌ DIFFERENCE FOUND", "red"))
-                print(colored("Differences:", "red"))
-                print(colored("bendsql result:", "red"))
-                print(colored(bend_result, "red"))
-                print(colored("snowsql result:", "red"))
-                print(colored(snow_result, "red"))
-                failed_tests.append((query_identifier, bend_result, snow_result))
-            else:
-                print(colored(f"✅ MATCH - Results are identical ({elapsed_time:.2f}s)", "green"))
-                passed_tests.append((query_identifier, elapsed_time))
-            
-            # Print current progress summary
-            print(colored(f"\nCurrent Progress: [passed: {len(passed_tests)}, failed: {len(failed_tests)}, total: {current_query}/{total_queries}]", "blue"))
+            print(colored("❌ DIFFERENCE FOUND", "red"))
+            # Show a truncated preview of the delta here; the full diff is
+            # printed once, in the detailed differences section of the summary.
+            print(colored("diff bendsql -> snowsql (preview):", "red"))
+            print_result_block(diff, color="red")
+            failed_tests.append((query_identifier, diff))
+            matched = False
+        else:
+            print(colored(f"✅ MATCH - Results are identical ({elapsed_time:.2f}s)", "green"))
+            passed_tests.append((query_identifier, elapsed_time))
+            matched = True
+
+        # Print current progress summary
+        print(colored(f"\nCurrent Progress: [passed: {len(passed_tests)}, failed: {len(failed_tests)}, total: {current_query}/{total_queries}]", "blue"))
+        return matched
+
+    async def cancel_pending():
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        # Cancelled pipelines close their sessions (terminating the CLI
+        # subprocesses) in run_pipeline's finally block.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    compared = 0
+    aborted = False
+    received = 0
+    while received < expected_results and not aborted:
+        item = await result_queue.get()
+        if isinstance(item, Exception):
+            print(colored(str(item), "red"))  # Print the error in red
+            await cancel_pending()
+            sys.exit(1)
+        sql_tool, idx, query, output, elapsed = item
+        received += 1
+        results[sql_tool][idx] = (output, elapsed)
+        for dup_idx in dup_map[sql_tool].get(idx, ()):
+            results[sql_tool][dup_idx] = (output, 0.0)
+        if use_cache:
+            key = cache_key(sql_tool, database_name, fingerprints[sql_tool], query)
+            with open(os.path.join(cache_dir, f"{key}.txt"), "w") as cache_file:
+                cache_file.write(output)
+
+        # Compare queries as soon as both tools have answered them, so
+        # --fail-fast can cancel the remaining pipelines on first failure
+        # instead of waiting out the whole run.
+        while (
+            compared < total_queries
+            and compared in results["bendsql"]
+            and compared in results["snowsql"]
+        ):
+            matched = compare_query(compared)
+            compared += 1
+            if not matched and fail_fast:
+                print(colored(
+                    "--fail-fast: cancelling remaining queries", "yellow"
+                ))
+                await cancel_pending()
+                aborted = True
+                break
+
+    if not aborted:
+        await asyncio.gather(*tasks)
+        # Anything left over (e.g. a fully cached run with no pipelines).
+        while compared < total_queries:
+            matched = compare_query(compared)
+            compared += 1
+            if not matched and fail_fast:
+                aborted = True
+                break
 
     total_end_time = time.time()
     total_elapsed_time = total_end_time - total_start_time
@@ -159,6 +882,11 @@ def run_check_sql(database_name, warehouse, script_path):
     print(colored(f"{'='*80}", "blue"))
     
     print(colored(f"\nTotal Queries: {total_queries}", "white"))
+    if aborted:
+        print(colored(
+            f"Aborted by --fail-fast after {compared} of {total_queries} queries",
+            "yellow",
+        ))
     print(colored(f"Passed: {len(passed_tests)} ({len(passed_tests)/total_queries*100:.1f}%)", "green"))
     print(colored(f"Failed: {len(failed_tests)} ({len(failed_tests)/total_queries*100:.1f}%)", "red" if failed_tests else "green"))
     print(colored(f"Total Time: {total_elapsed_time:.2f}s", "blue"))
@@ -170,16 +898,14 @@ def run_check_sql(database_name, warehouse, script_path):
 
     if failed_tests:
         print(colored("\nFailed Tests:", "red"))
-        for i, (test, _, _) in enumerate(failed_tests, 1):
+        for i, (test, _) in enumerate(failed_tests, 1):
             print(colored(f"  {i}. {test}", "red"))
         
         print(colored("\nDetailed Differences:", "red"))
-        for i, (test, bend_result, snow_result) in enumerate(failed_tests, 1):
+        for i, (test, diff) in enumerate(failed_tests, 1):
             print(colored(f"\n{i}. Test: {test}", "red"))
-            print(colored("   bendsql result:", "yellow"))
-            print(f"   {bend_result.replace(chr(10), chr(10)+'   ')}")
-            print(colored("   snowsql result:", "yellow"))
-            print(f"   {snow_result.replace(chr(10), chr(10)+'   ')}")
+            print(colored("   diff bendsql -> snowsql:", "yellow"))
+            print_result_block(diff, max_lines=sys.maxsize, indent="   ")
     
     # Final result indicator
     if failed_tests:
@@ -188,7 +914,51 @@ def run_check_sql(database_name, warehouse, script_path):
         print(colored(f"\n✅ COMPARISON SUCCESSFUL: All {total_queries} queries match!", "green"))
 
 
-def setup_database(database_name, sql_tool):
+async def warm_snowsql_auth():
+    """Run one throwaway snowsql query so its auth handshake happens once.
+
+    snowsql caches its ID token and OCSP responses under ~/.snowsql; warming
+    the cache up front lets every later invocation (sessions, batch scripts,
+    fallbacks) skip the ~0.5-2s re-authentication round-trip."""
+    cache_dir = os.path.expanduser("~/.snowsql")
+    os.environ.setdefault("SNOWSQL_OCSP_RESPONSE_CACHE_DIR", cache_dir)
+    try:
+        # stdin is closed so that a misconfigured environment (no
+        # SNOWSQL_PWD, no config file) makes snowsql's credential prompt
+        # fail immediately instead of blocking on an invisible read.
+        process = await asyncio.create_subprocess_exec(
+            "snowsql",
+            "--query", "SELECT 1",
+            "-o", "friendly=false",
+            "-o", "timing=false",
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            close_fds=False,
+        )
+        try:
+            await asyncio.wait_for(process.wait(), timeout=120)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            print(colored(
+                "snowsql auth warm-up timed out after 120s; "
+                "continuing without a warmed token cache",
+                "yellow",
+            ))
+            return
+    except FileNotFoundError:
+        print(colored("snowsql not found; skipping auth warm-up", "yellow"))
+        return
+    if process.returncode != 0:
+        print(colored(
+            f"snowsql auth warm-up exited with {process.returncode}; "
+            "continuing without a warmed token cache",
+            "yellow",
+        ))
+
+
+async def setup_database(database_name, sql_tool):
     print(colored(f"\nSetting up database '{database_name}' using {sql_tool}...", "blue"))
     
     # For bendsql, we need to handle the case where the database doesn't exist yet
@@ -196,24 +966,24 @@ def setup_database(database_name, sql_tool):
         # Try to drop the database, but ignore errors if it doesn't exist
         try:
             drop_query = f"DROP DATABASE IF EXISTS {database_name};"
-            execute_sql(drop_query, sql_tool, "default")  # Use default database for initial connection
+            await execute_sql(drop_query, sql_tool, "default")  # Use default database for initial connection
         except Exception as e:
             print(f"Warning: Could not drop database (it may not exist): {e}")
         
         # Create the database
         create_query = f"CREATE DATABASE {database_name};"
-        execute_sql(create_query, sql_tool, "default")  # Use default database for initial connection
+        await execute_sql(create_query, sql_tool, "default")  # Use default database for initial connection
     else:
         # For snowsql, the IF EXISTS clause works as expected
         drop_query = f"DROP DATABASE IF EXISTS {database_name};"
         create_query = f"CREATE DATABASE {database_name};"
-        execute_sql(drop_query, sql_tool, database_name)
-        execute_sql(create_query, sql_tool, database_name)
+        await execute_sql(drop_query, sql_tool, database_name)
+        await execute_sql(create_query, sql_tool, database_name)
     
     print(colored(f"✅ Database '{database_name}' has been set up successfully.", "green"))
 
 
-def setup_and_execute(sql_tool, base_sql_dir, database_name, warehouse=None):
+async def setup_and_execute(sql_tool, base_sql_dir, database_name, warehouse=None):
     # Determine the correct setup directory based on the SQL tool
     setup_dir = "bend" if sql_tool == "bendsql" else "snow"
 
@@ -221,23 +991,31 @@ def setup_and_execute(sql_tool, base_sql_dir, database_name, warehouse=None):
     print(colored(f"Setting up and executing {sql_tool} scripts", "blue"))
     print(colored(f"{'='*80}", "blue"))
     
-    setup_database(database_name, sql_tool)
+    await setup_database(database_name, sql_tool)
 
     print(colored(f"\nExecuting setup scripts for {sql_tool}...", "blue"))
-    execute_sql_scripts(
+    await execute_sql_scripts(
         sql_tool, f"{base_sql_dir}/{setup_dir}/setup.sql", database_name, warehouse
     )
     
     print(colored(f"\nExecuting action scripts for {sql_tool}...", "blue"))
-    execute_sql_scripts(
+    await execute_sql_scripts(
         sql_tool, f"{base_sql_dir}/action.sql", database_name, warehouse
     )
     
     print(colored(f"✅ All {sql_tool} scripts executed successfully.", "green"))
 
 
-def main():
+async def main():
+    global _VERBOSE
     args = parse_arguments()
+    _VERBOSE = args.verbose
+
+    # stdout is often a line-buffered pipe on CI; batching writes keeps
+    # terminal I/O from dominating runs with thousands of queries. Keep
+    # default buffering on a TTY so interactive runs still show progress.
+    if not sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
 
     base_sql_dir = f"sql/{args.case}"
     database_name, warehouse = args.database, args.warehouse
@@ -248,28 +1026,54 @@ def main():
     print(colored(f"Database: {database_name}", "blue"))
     print(colored(f"{'='*80}\n", "blue"))
 
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    # Every run path ends with the snowsql-vs-bendsql check, so amortize the
+    # Snowflake auth handshake across the whole run up front.
+    await warm_snowsql_auth()
+
     if args.run_check_only:
         # Run only the check script
         print(colored("Running check queries only (skipping setup and action scripts)", "yellow"))
         check_sql_path = f"{base_sql_dir}/check.sql"
-        run_check_sql(database_name, warehouse, check_sql_path)
+        await run_check_sql(
+            database_name,
+            warehouse,
+            check_sql_path,
+            args.jobs,
+            cache_dir,
+            fail_fast=args.fail_fast,
+            native=args.native,
+        )
     else:
         # Setup database based on the specified arguments
         if args.runbend:
             print(colored("Running bendsql setup and action only", "yellow"))
-            setup_and_execute("bendsql", base_sql_dir, database_name)
+            await setup_and_execute("bendsql", base_sql_dir, database_name)
         elif args.runsnow:
             print(colored("Running snowsql setup and action only", "yellow"))
-            setup_and_execute("snowsql", base_sql_dir, database_name, warehouse)
+            await setup_and_execute("snowsql", base_sql_dir, database_name, warehouse)
         else:
             print(colored("Running complete test (bendsql and snowsql)", "yellow"))
-            setup_and_execute("bendsql", base_sql_dir, database_name)
-            setup_and_execute("snowsql", base_sql_dir, database_name, warehouse)
+            # The two setups hit independent systems, so run them concurrently;
+            # this roughly halves setup wall time.
+            await asyncio.gather(
+                setup_and_execute("bendsql", base_sql_dir, database_name),
+                setup_and_execute("snowsql", base_sql_dir, database_name, warehouse),
+            )
 
         # Compare results from check.sql after executing scripts
         check_sql_path = f"{base_sql_dir}/check.sql"
-        run_check_sql(database_name, warehouse, check_sql_path)
+        await run_check_sql(
+            database_name,
+            warehouse,
+            check_sql_path,
+            args.jobs,
+            cache_dir,
+            fail_fast=args.fail_fast,
+            native=args.native,
+        )
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())